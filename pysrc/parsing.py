@@ -31,17 +31,37 @@ of heap allocators on artificial workloads. We can manage the size of our free d
 usage is more robust and allows for many patterns. Please see the readme for detailed instructions.
 """
 
+import array
+import bisect
 import enum
+import itertools
+import mmap
+import os
 import random
+import re
 import sys
 
 ALL_IDS = -2
+OUTPUT_BATCH = 1 << 16
+
+# The call name, its first argument, an optional second argument, and the returned address of an ltrace heap line.
+# Ltrace pads its columns with spaces so every token may be surrounded by whitespace. Calls that libc makes on its own
+# behalf are not requests from the traced program so the arrow may not follow libc. Only a non NULL hex address counts
+# as a returned address, so failed calls that return 0 or nil are incomplete requests. Traces saved with Windows line
+# endings keep a carriage return before every newline.
+HEAP_LINE_REGEX = re.compile(
+    rb'->(?<!libc\.so\.6->)(malloc|calloc|realloc|free)\([ \t]*([^,)<\s]*)[ \t]*(?:,[ \t]*([^)<\s]*)[ \t]*)?'
+    rb'(?:\)[ \t]*=[ \t]*(0x0*[1-9a-fA-F][0-9a-fA-F]*)[ \t]*\r?$)?', re.MULTILINE)
+
+# A script generation argument: the request name, an optional byte size or range in parentheses, and an optional number
+# of requests after the next space.
+GENERATE_ARG_REGEX = re.compile(r'-?([A-Za-z]*)(?:\(([^)]*)\))?(?: +(\d+))?')
 
 class Heap_Strings():
-    malloc = 'malloc'
-    calloc = 'calloc'
-    realloc = 'realloc'
-    free = 'free'
+    malloc = b'malloc'
+    calloc = b'calloc'
+    realloc = b'realloc'
+    free = b'free'
 
 
 class Heap_Call(enum.Enum):
@@ -57,230 +77,241 @@ class Print_Call():
     leak = 'l'
 
 
-def get_heap_address(line):
+# Script line prefixes are built once so the hot loop only formats the ids and sizes.
+ALLOC_PREFIX = f'{Print_Call.alloc} '
+REALLOC_PREFIX = f'{Print_Call.realloc} '
+FREE_PREFIX = f'{Print_Call.free} '
+
+# The request types a script validator checks, as written and as read back from a script opened in binary mode.
+SCRIPT_CALLS = (Print_Call.alloc, Print_Call.realloc, Print_Call.free)
+BINARY_SCRIPT_CALLS = tuple(call.encode() for call in SCRIPT_CALLS)
+
+# The request names accepted on the command line for script generation.
+REQUEST_CALLS = {
+    'alloc': Print_Call.alloc,
+    'realloc': Print_Call.realloc,
+    'free': Print_Call.free,
+    'leak': Print_Call.leak,
+}
+
+# The hot loops compare against these once per request so bind them as plain globals rather than class attributes.
+MALLOC_NAME = Heap_Strings.malloc
+CALLOC_NAME = Heap_Strings.calloc
+FREE_NAME = Heap_Strings.free
+ALLOC_CALL = Heap_Call.alloc
+REALLOC_CALL = Heap_Call.realloc
+FREE_CALL = Heap_Call.free
+
+def match_heap_request(m):
     """
-    Given a line of text, determines the hexadecimal address of the heap request. However, we will
-    just take the number as a unique integer to put into our map, base 10.
-    >>> get_heap_address('gcc->malloc(48)=0x18102a0')
-    25232032
-    >>> get_heap_address('gcc->free(0x1836e50)=<void>')
-    25390672
-    >>> get_heap_address('gcc-g3-O0-std=gnu99-Wall$warnflagstriangle.c-otriangle')
-    >>> get_heap_address('+++exited(status0)+++')
-    >>> get_heap_address('---SIGCHLD(Childexited)---')
-    >>> get_heap_address('nvim->free(0x22e8f10<noreturn...>')
-    36605712
+    Given a match of the HEAP_LINE_REGEX, returns a tuple of the heap call, the heap address as the bytes the trace
+    printed, and the string number of bytes requested if relevant. Requests interrupted before the call completes or
+    made on a NULL address return None.
+    >>> match_heap_request(HEAP_LINE_REGEX.search(b'make->calloc(8192,4)=0x56167a22c440'))
+    (<Heap_Call.alloc: 1>, b'0x56167a22c440', '32768')
+    >>> match_heap_request(HEAP_LINE_REGEX.search(b'make->free(0)=<void>'))
+    >>> match_heap_request(HEAP_LINE_REGEX.search(b'make->free(nil)=<void>'))
     """
-    # The arrow prepends any malloc, calloc, realloc, or free.
-    call_index = line.find('->')
-    if call_index == -1:
-        return None
-    open_paren = line.find('(', call_index)
-    # Some edgecase errors can interrupt a normal free line, so find free id by name rather than = sign.
-    if line[call_index + 2:open_paren] == 'free':
-        i = open_paren + 1
-        while i < len(line) and line[i].isalnum():
-            i += 1
-        try:
-            return int(line[open_paren + 1: i], 16)
-        except ValueError:
-            return None
-    # Now we have a more simple search because we know ID is on the right side of equals sign.
-    equals = line.find('=', call_index)
-    second_half = line[equals + 1:]
+    # Unpack every group in one call rather than paying for a method call per group.
+    call, first, second, returned = m.groups()
     try:
-        return int(second_half, 16)
-    except ValueError:
+        # Some edgecase errors can interrupt a normal free line, so find free id by name rather than = sign.
+        # Ltrace prints every address in the same hex form so the printed bytes already identify an address and key our
+        # dictionaries as they are. The regex only vouches for returned addresses, so a freed one must still parse as a
+        # non NULL hex number.
+        if call == FREE_NAME:
+            return (FREE_CALL, first, None) if int(first, 16) else None
+        # Any other call is only complete if we can see the address it returned.
+        if returned is None:
+            return None
+        heap_address = returned
+        if call == MALLOC_NAME:
+            return ALLOC_CALL, heap_address, str(int(first))
+        elif call == CALLOC_NAME:
+            # Most callocs ask for single bytes or a single element so the other argument is already the total.
+            if second == b'1' and first.isdigit():
+                return ALLOC_CALL, heap_address, first.decode()
+            if first == b'1' and second.isdigit():
+                return ALLOC_CALL, heap_address, second.decode()
+            return ALLOC_CALL, heap_address, str(int(first) * int(second))
+        return REALLOC_CALL, heap_address, str(int(second))
+    # There are some strange calloc(1,16<noreturn> erors that can mess up int function.
+    except (TypeError, ValueError):
         return None
 
 
-def get_heap_call(line):
-    """
-    Given a line of text from an ltrace output, determines the type of call to heap we will place in our script file:
-    alloc, realloc, or free. Returns the appropriate call.
-
-    >>> get_heap_call('make->calloc(8192,1)=0x56167a22c440')
-    <Heap_Call.alloc: 1>
-    >>> get_heap_call('make->malloc(8192)=0x56167a22c440')
-    <Heap_Call.alloc: 1>
-    >>> get_heap_call('make->free(0x56167a22c440)=<void>')
-    <Heap_Call.free: 3>
-    >>> get_heap_call('make->realloc(0x56167a22c440,8192)=0x56167a22c440')
-    <Heap_Call.realloc: 2>
-    >>> get_heap_address('gcc-g3-O0-std=gnu99-Wall$warnflagstriangle.c-otriangle')
-    >>> get_heap_address('+++exited(status0)+++')
-    >>> get_heap_address('---SIGCHLD(Childexited)---')
-    >>> libc.so.6->calloc(94045449572224, 240)  = 0x5588a99d4f80
+def parse_heap_line(line):
+    r"""
+    Given a line of ltrace output, returns a tuple of the heap call, the heap address as the bytes the trace printed,
+    and the string number of bytes requested if relevant. One compiled regex finds the call, its arguments, and the
+    returned address in a single pass over the line. Lines read from a file opened in binary mode are scanned as they
+    are. Lines unrelated to the heap or interrupted before the call completes return None.
+    >>> parse_heap_line('gcc->malloc(48)=0x18102a0')
+    (<Heap_Call.alloc: 1>, b'0x18102a0', '48')
+    >>> parse_heap_line('make->calloc(8192, 1)                            = 0x56167a22c440')
+    (<Heap_Call.alloc: 1>, b'0x56167a22c440', '8192')
+    >>> parse_heap_line('gcc->free(0x1836e50)                             = <void>')
+    (<Heap_Call.free: 3>, b'0x1836e50', None)
+    >>> parse_heap_line('make->malloc(8192 <unfinished ...>')
+    >>> parse_heap_line('make->calloc(8192,4)=0x56167a22c440')
+    (<Heap_Call.alloc: 1>, b'0x56167a22c440', '32768')
+    >>> parse_heap_line('make->calloc(1, 240)=0x56167a22c440')
+    (<Heap_Call.alloc: 1>, b'0x56167a22c440', '240')
+    >>> parse_heap_line('make->realloc(0x56167a22c440,8192)=0x56167a22c440')
+    (<Heap_Call.realloc: 2>, b'0x56167a22c440', '8192')
+    >>> parse_heap_line('nvim->free(0x22e8f10<noreturn...>')
+    (<Heap_Call.free: 3>, b'0x22e8f10', None)
+    >>> parse_heap_line('make->malloc(8192<no_return>=...')
+    >>> parse_heap_line('libc.so.6->calloc(94045449572224,240)=0x5588a99d4f80')
+    >>> parse_heap_line('gcc-g3-O0-std=gnu99-Wall$warnflagstriangle.c-otriangle')
+    >>> parse_heap_line('+++exited(status0)+++')
+    >>> parse_heap_line('---SIGCHLD(Childexited)---')
+    >>> parse_heap_line('make->malloc(0) = nil')
+    >>> parse_heap_line(b'gcc->realloc(0x1836f10, 176)                     = 0x1836f10')
+    (<Heap_Call.realloc: 2>, b'0x1836f10', '176')
+    >>> parse_heap_line(b'make->malloc(48) = 0x18102a0\r\n')
+    (<Heap_Call.alloc: 1>, b'0x18102a0', '48')
     """
-    if line.startswith("libc."):
-        return None
-    call_index = line.find('->')
-    if call_index == -1:
-        return None
-    i = call_index + 2
-    while i < len(line) and line[i] != '(':
-        i += 1
-    call = line[call_index + 2: i]
-    if call == Heap_Strings.calloc or call == Heap_Strings.malloc:
-        return Heap_Call.alloc
-    elif call == Heap_Strings.realloc:
-        return Heap_Call.realloc
-    elif call == Heap_Strings.free:
-        return Heap_Call.free
-
-
-def get_heap_bytes(line):
-    """
-    Given a line of text from an ltrace output file returns the number of bytes requested for the heap call if relevant.
-    Calloc, malloc, and realloc will all require byte size information. Free requires no byte size. We return the bytes
-    or None if no bytes are found.
-    >>> get_heap_bytes('make->calloc(8192,1)=0x56167a22c440')
-    '8192'
-    >>> get_heap_bytes('make->calloc(8192,4)=0x56167a22c440')
-    '32768'
-    >>> get_heap_bytes('make->malloc(8192)=0x56167a22c440')
-    '8192'
-    >>> get_heap_bytes('make->free(0x56167a22c440)=<void>')
-    >>> get_heap_bytes('make->realloc(0x56167a22c440,8192)=0x56167a22c440')
-    '8192'
-    >>> get_heap_bytes('make->calloc(8192,4<no_return>=...')
-    >>> get_heap_bytes('make->malloc(8192<no_return>=...')
-    >>> get_heap_bytes('make->realloc(0x56167a22c440,8192<noreturn>...=0x56167a22c440')
-    >>> get_heap_bytes('make-><resuming>=...')
-    >>> get_heap_bytes('gcc-g3-O0-std=gnu99-Wall$warnflagstriangle.c-otriangle')
-    >>> get_heap_bytes('+++exited(status0)+++')
-    >>> get_heap_bytes('---SIGCHLD(Childexited)---')
-    """
-    arrow = line.find('->')
-    if arrow == -1:
-        return None
-    open_bracket = line.find('(', arrow)
-    specific_call = line[arrow + 2: open_bracket]
-    if specific_call == Heap_Strings.calloc:
-        comma = line.find(',', open_bracket)
-        number_of_items = line[open_bracket + 1: comma]
-        closing_bracket = line.find(')', comma)
-        byte_size = line[comma + 1: closing_bracket]
-        # There are some strange calloc(1,16<noreturn> erors that can mess up int function.
-        try:
-            return str(int(number_of_items) * int(byte_size))
-        except ValueError:
-            return None
-
-    elif specific_call == Heap_Strings.malloc:
-        closing_bracket = line.find(')', open_bracket)
-        full_bytes = line[open_bracket + 1: closing_bracket]
-        try:
-            return str(int(full_bytes))
-        except ValueError:
-            return None
+    m = HEAP_LINE_REGEX.search(line if isinstance(line, bytes) else line.encode())
+    return m and match_heap_request(m)
 
-    elif specific_call == Heap_Strings.realloc:
-        comma = line.find(',', open_bracket)
-        closing_bracket = line.find(')', comma)
-        full_bytes = line[comma + 1: closing_bracket]
-        try:
-            return str(int(full_bytes))
-        except ValueError:
-            return None
-    return None
 
-
-def add_line(call_type, memory_id, total_bytes):
+def read_heap_requests(input_trace):
     """
-    Given a heap call type, free, alloc, or realloc, returns a string formatted for .script files as appropriate.
-    >>> add_line(Heap_Call.free, 4, '0')
-    'f 4'
-    >>> add_line(Heap_Call.alloc, 3, '900')
-    'a 3 900'
-    >>> add_line(Heap_Call.realloc, 3, '1200')
-    'r 3 1200'
+    Given a file with the output from the ltrace command, yields the tuple of call, address, and bytes for every
+    heap request in the order the traced program made them. The file is memory mapped and the compiled regex scans the
+    mapping directly, so the many trace lines unrelated to the heap are never copied or handed to the interpreter.
     """
-    if call_type == Heap_Call.free:
-        return f'{Print_Call.free} {memory_id}'
-    elif call_type == Heap_Call.alloc:
-        return f'{Print_Call.alloc} {memory_id} {total_bytes}'
-    elif call_type == Heap_Call.realloc:
-        return f'{Print_Call.realloc} {memory_id} {total_bytes}'
-
-
-def print_heap_call(line, memory_dict, memory_ids):
+    with open(input_trace, 'rb') as f:
+        trace_size = os.fstat(f.fileno()).st_size
+        # An empty file cannot be mapped and holds no requests anyway.
+        if not trace_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as trace:
+            for m in HEAP_LINE_REGEX.finditer(trace):
+                heap_request = match_heap_request(m)
+                if heap_request:
+                    yield heap_request
+
+
+def record_heap_request(heap_request, memory_dict, prev_ids, memory_ids, out):
     """
-    Given a line of ltrace output to process, a dictionary of currently active memory ids, and our most recent memory
-    id, print a text line for a script file of either allocate "a", reallocate "r", or free "f". Return the memory id
-    which will remain the same on free, or possibly be updated upon realloc or alloc.
-
-    >>> print_heap_call('gcc->malloc(48)=0x18102a0', {}, 0)
-    a 0 48
-    1
-    >>> print_heap_call('gcc->free(0x1836e50)=<void>', {25390672:[0]}, 1)
-    f 0
-    1
-    >>> print_heap_call('gcc->free(0x1836e50)=<void>', {25390672:[0,1,2,3]}, 4)
-    f 3
-    4
-    >>> print_heap_call('gcc-g3-O0-std=gnu99-Wall$warnflagstriangle.c-otriangle', {25390672:[0]}, 1)
-    1
-    >>> print_heap_call('+++exited(status0)+++', {25390672:[0]}, 1)
-    1
-    >>> print_heap_call('---SIGCHLD(Childexited)---', {25390672:[0]}, 1)
-    1
-    >>> print_heap_call('nvim->free(0x22e8f10<noreturn...>', {25390672:[0]}, 1)
+    Given a tuple of heap call, address, and bytes, a dictionary of addresses to their most recent active memory id, an
+    array of the id each memory id shadows at its address, our most recent memory id, and a list of pending script
+    lines, append a line for a script file of either allocate "a", reallocate "r", or free "f" to the list. Return the
+    memory id which will remain the same on free, or possibly be updated upon realloc or alloc.
+
+    >>> out = []
+    >>> memory_dict = {}
+    >>> prev_ids = array.array('q')
+    >>> record_heap_request((Heap_Call.alloc, b'0x18102a0', '48'), memory_dict, prev_ids, 0, out)
     1
+    >>> record_heap_request((Heap_Call.alloc, b'0x18102a0', '16'), memory_dict, prev_ids, 1, out)
+    2
+    >>> out
+    ['a 0 48', 'a 1 16']
+    >>> memory_dict, prev_ids
+    ({b'0x18102a0': 1}, array('q', [-1, 0]))
+    >>> record_heap_request((Heap_Call.free, b'0x18102a0', None), memory_dict, prev_ids, 2, out)
+    2
+    >>> record_heap_request((Heap_Call.free, b'0x1836e50', None), memory_dict, prev_ids, 2, out)
+    2
+    >>> record_heap_request((Heap_Call.realloc, b'0x1836f10', '176'), memory_dict, prev_ids, 2, out)
+    3
+    >>> out[2], out[3].splitlines()
+    ('f 1', ['a 2 8', 'r 2 176'])
+    >>> memory_dict
+    {b'0x18102a0': 0, b'0x1836f10': 2}
     """
-    line = line.strip()
-    line = line.replace(" ", "")
-    # Get the call and memory address
-    heap_address = get_heap_address(line)
-
-    # We will early return if the line is not related to heap calls and returns an empty string.
-    if not heap_address:
-        return memory_ids
-
-    call = get_heap_call(line)
-    # Ignore any frees that are not in our dictionary.
-    if call == Heap_Call.free and heap_address in memory_dict:
-        id_list = memory_dict[heap_address]
-        to_del = id_list[len(id_list) - 1]
-        print(add_line(Heap_Call.free, to_del, 0))
-        id_list.pop()
-        if (len(id_list) == 0):
-            memory_dict.pop(heap_address)
-
-    elif call == Heap_Call.realloc:
-        if (heap_address not in memory_dict):
-            memory_dict[heap_address] = [memory_ids]
-            print(add_line(Heap_Call.alloc, memory_ids, 8))
-            memory_ids += 1
-        # We have multiple malloc callocs under same id so just choose one at random to realloc.
-        to_realloc = random.choice(memory_dict[heap_address])
-        print(add_line(Heap_Call.realloc, to_realloc, get_heap_bytes(line)))
-
-    elif call == Heap_Call.alloc:
-        if (heap_address not in memory_dict):
-            memory_dict[heap_address] = []
-        memory_dict[heap_address].append(memory_ids)
-        print(add_line(Heap_Call.alloc, memory_ids, get_heap_bytes(line)))
+    call, heap_address, total_bytes = heap_request
+    # Each address holds only its newest id and every id remembers the id it shadows, or -1 if it shadows none. The
+    # rare address the trace allocates again before freeing forms a chain through prev_ids instead of a container.
+    # Look the address up once and let every branch reuse the result.
+    tail = memory_dict.get(heap_address)
+    if call is FREE_CALL:
+        # Ignore any frees that are not in our dictionary.
+        if tail is None:
+            return memory_ids
+        prev_id = prev_ids[tail]
+        if prev_id < 0:
+            del memory_dict[heap_address]
+        else:
+            memory_dict[heap_address] = prev_id
+        out.append(f'{FREE_PREFIX}{tail}')
+
+    elif call is REALLOC_CALL:
+        # An address we never saw allocated gets a small allocation first. Both lines go out as one entry.
+        if tail is None:
+            memory_dict[heap_address] = memory_ids
+            prev_ids.append(-1)
+            out.append(f'{ALLOC_PREFIX}{memory_ids} 8\n{REALLOC_PREFIX}{memory_ids} {total_bytes}')
+            return memory_ids + 1
+        # We have multiple malloc callocs under same id so realloc the most recent one.
+        out.append(f'{REALLOC_PREFIX}{tail} {total_bytes}')
+
+    elif call is ALLOC_CALL:
+        memory_dict[heap_address] = memory_ids
+        prev_ids.append(-1 if tail is None else tail)
+        out.append(f'{ALLOC_PREFIX}{memory_ids} {total_bytes}')
         memory_ids += 1
     return memory_ids
 
 
-def parse_file_heap_use(input_trace):
+def live_memory_ids(memory_dict, prev_ids):
     """
-    Given a file with the output from the ltrace command on unix like systems, add lines to a
-    .script file corresponding to the requests to the heap.
+    Given a dictionary of addresses to their most recent active memory id and the array of ids each memory id shadows,
+    yields every active memory id. Addresses come in the order they were first allocated and the ids of one address
+    come oldest first.
+    >>> list(live_memory_ids({10: 2, 20: 1}, array.array('q', [-1, -1, 0])))
+    [0, 2, 1]
+    """
+    for tail in memory_dict.values():
+        if prev_ids[tail] < 0:
+            yield tail
+            continue
+        chain = []
+        while tail >= 0:
+            chain.append(tail)
+            tail = prev_ids[tail]
+        yield from reversed(chain)
+
+
+def write_script_lines(out, script_file, validator):
+    """
+    Given a list of pending script lines, an open script file, and a Script_Validator, validate the lines and write them
+    to the file, each ending in a newline. Entries may hold more than one line so the validator sees the joined text
+    split back into single lines.
+    """
+    if not out:
+        return
+    text = '\n'.join(out)
+    validator.feed_lines(text.splitlines())
+    script_file.write(text)
+    script_file.write('\n')
+
+
+def parse_file_heap_use(input_trace, script_file, validator):
+    """
+    Given a file with the output from the ltrace command on unix like systems, an open .script file, and a
+    Script_Validator, add lines to the .script file corresponding to the requests to the heap. Every line is validated
+    before it is written.
     """
     memory_dict = {}
+    prev_ids = array.array('q')
     memory_ids = 0
-    with open(input_trace, encoding='utf-8') as f:
-        for line in f:
-            memory_ids = print_heap_call(line, memory_dict, memory_ids)
-        for idx, val in enumerate(memory_dict.values()):
-            for i, v in enumerate(val):
-                if idx == len(memory_dict) - 1 and i == len(val) - 1:
-                    print(add_line(Heap_Call.free, v, 0), end='')
-                else:
-                    print(add_line(Heap_Call.free, v, 0))
+    out = []
+    # The loop runs once per request so read these as locals rather than module globals every time.
+    record = record_heap_request
+    batch_size = OUTPUT_BATCH
+    for heap_request in read_heap_requests(input_trace):
+        memory_ids = record(heap_request, memory_dict, prev_ids, memory_ids, out)
+        # Writing script lines in batches saves a print call and a trip through stdout for every request.
+        if len(out) >= batch_size:
+            write_script_lines(out, script_file, validator)
+            out.clear()
+    # Free everything the trace left behind.
+    out.extend([f'{FREE_PREFIX}{v}' for v in live_memory_ids(memory_dict, prev_ids)])
+    write_script_lines(out, script_file, validator)
 
 
 def identify_call(call_string):
@@ -294,18 +325,24 @@ def identify_call(call_string):
     >>> identify_call('free 500')
     'f'
     """
-    i = 0
-    while i < len(call_string) and call_string[i].isalpha():
-        i += 1
-    call = call_string[:i]
-    if call == 'alloc':
-        return Print_Call.alloc
-    elif call == 'realloc':
-        return Print_Call.realloc
-    elif call == 'free':
-        return Print_Call.free
-    elif call == 'leak':
-        return Print_Call.leak
+    return REQUEST_CALLS.get(GENERATE_ARG_REGEX.match(call_string).group(1))
+
+
+def request_byte_range(byte_spec):
+    """
+    Given the text between the parentheses of a heap request, or None if there were none, returns a tuple of the byte
+    range the user desires as integers.
+    >>> request_byte_range('500')
+    (500, None)
+    >>> request_byte_range('50,500')
+    (50, 500)
+    """
+    # The user has not made any specification on range so we choose random
+    if byte_spec is None:
+        return random.randint(1, 50), random.randint(200, 1200)
+    # The user has requested uniform sizes of all requests or entered alloc(lower_bound,upper_bound)
+    lower_bound, _, upper_bound = byte_spec.partition(',')
+    return int(lower_bound), int(upper_bound) if upper_bound else None
 
 
 def identify_byte_range(call_str):
@@ -321,24 +358,7 @@ def identify_byte_range(call_str):
     >>> identify_byte_range('realloc(500,1200) ')
     (500, 1200)
     """
-    i = 0
-    while i < len(call_str) and call_str[i] != '(' and call_str[i] != ' ':
-        i += 1
-    # The user has not made any specification on range so we choose random
-    if i == len(call_str) or call_str[i] == ' ':
-        return random.randint(1, 50), random.randint(200, 1200)
-    j = i + 1
-    while j < len(call_str) and call_str[j] != ',' and call_str[j] != ')':
-        j += 1
-    # The user has requested uniform sizes of all requests.
-    if call_str[j] == ')':
-        uniform_byte_size = call_str[i + 1: j]
-        return int(uniform_byte_size), None
-    # The user has entered alloc(lower_bound,upper_bound)
-    lower_bound = call_str[i + 1: j]
-    closing_bracket = call_str.find(')', j)
-    upper_bound = call_str[j + 1: closing_bracket]
-    return int(lower_bound), int(upper_bound)
+    return request_byte_range(GENERATE_ARG_REGEX.match(call_str).group(2))
 
 
 def identify_num_requests(call_str):
@@ -361,45 +381,56 @@ def identify_num_requests(call_str):
     >>> identify_num_requests('free')
     -2
     """
-    space = call_str.find(' ')
+    num_requests = GENERATE_ARG_REGEX.match(call_str).group(3)
     # We are out of arguments
-    if space == -1 or call_str[space + 1] == '-':
-        return ALL_IDS
-    next_space = call_str.find(' ', space + 1)
-    # Free a certain number was the last user request.
-    if next_space == -1:
-        return int(call_str[space + 1:])
-    return int(call_str[space + 1: next_space])
-
-
-def generate_frees(arg_string, id_byte_map, free_ids):
-    """
-    Given an argument string from the command line, a dict of ids to manage, and our last free id, print the appropriate
-    free calls, manage the dict, and return the new free_id. Free id's default to freeing every other block of allocated
-    memory for the purposes of artificial workloads. This prevents coalescing from absorbing all memory into one large
-    block if we want to create a large data structure of free memory.
-    >>> generate_frees('free', {0:2,1:10,2:400}, 0)
-    f 0
-    f 2
+    return ALL_IDS if num_requests is None else int(num_requests)
+
+
+def identify_request(call_str):
+    """
+    Given a string with a request pattern from the user, returns a tuple of the printable request type, the byte range,
+    and the number of requests. One compiled regex reads all three in a single pass over the argument.
+    >>> identify_request('-alloc(50,500) 600 -free')
+    ('a', (50, 500), 600)
+    >>> identify_request('realloc(800) -free')
+    ('r', (800, None), -2)
+    """
+    call, byte_spec, num_requests = GENERATE_ARG_REGEX.match(call_str).groups()
+    return (REQUEST_CALLS.get(call), request_byte_range(byte_spec),
+            ALL_IDS if num_requests is None else int(num_requests))
+
+
+def generate_frees(arg_string, live_flags, free_ids, out):
+    """
+    Given an argument string from the command line, the live flags of the ids to manage, our last free id, and a list of
+    pending script lines, append the appropriate free calls, manage the flags, and return the new free_id. Free id's
+    default to freeing every other block of allocated memory for the purposes of artificial workloads. This prevents
+    coalescing from absorbing all memory into one large block if we want to create a large data structure of free
+    memory.
+    >>> out = []
+    >>> generate_frees('free', bytearray([1, 1, 1]), 0, out)
     4
-    >>> generate_frees('free 2', {0:2,1:10,2:400,3:500,4:600}, 0)
-    f 0
-    f 2
+    >>> out
+    ['f 0', 'f 2']
+    >>> out = []
+    >>> generate_frees('free 2', bytearray([1, 1, 1, 1, 1]), 0, out)
     4
-    >>> generate_frees('free 3', {0:2,1:10,2:400,3:500,4:600}, 0)
-    f 0
-    f 2
-    f 4
+    >>> out
+    ['f 0', 'f 2']
+    >>> out = []
+    >>> generate_frees('free 3', bytearray([1, 1, 1, 1, 1]), 0, out)
     6
+    >>> out
+    ['f 0', 'f 2', 'f 4']
     """
-    num_requests = identify_num_requests(arg_string[1:])
+    num_requests = identify_num_requests(arg_string)
     if num_requests == ALL_IDS:
-        num_requests = len(id_byte_map)
+        num_requests = live_flags.count(1)
     for i in range(free_ids, num_requests):
-        # Prevent a key error here if the user enters more frees than they have allocated memory.
-        if free_ids in id_byte_map:
-            id_byte_map.pop(free_ids)
-            print(f'{Print_Call.free} {free_ids}')
+        # Prevent an index error here if the user enters more frees than they have allocated memory.
+        if free_ids < len(live_flags) and live_flags[free_ids]:
+            live_flags[free_ids] = 0
+            out.append(f'{FREE_PREFIX}{free_ids}')
             free_ids += 2
         # No point in continuing useless loop. We have mismatched allocation and free quantities.
         else:
@@ -407,119 +438,236 @@ def generate_frees(arg_string, id_byte_map, free_ids):
     return free_ids
 
 
-def generate_allocs(arg_string, id_byte_map, alloc_ids):
+def request_sizes(byte_tuple, num_requests):
     """
-    Given an argument string from the command line, a dict of ids to manage, the last alloc id, print the appropriate
-    alloc calls, manage the dict, and return the new alloc_id. We allow the user to define one sized set of allocations,
-    a size range, or no sizes, in which case we will choose random sizes for them.
-    >>> generate_allocs('alloc(20) 3', {}, 0)
-    a 0 20
-    a 1 20
-    a 2 20
+    Given a byte range tuple from identify_byte_range and a number of requests, returns the byte size of every request.
+    A range of at most 65536 sizes draws the random bits for all of its sizes in one call and reduces each 32 bit draw
+    into the range, rather than asking the random module for one bounded number per request. The modulo bias is then
+    below one part in 65536. Wider ranges ask for one bounded number per request so every size stays reachable and
+    equally likely. A range that ends below where it starts raises a ValueError.
+    >>> list(request_sizes((20, None), 3))
+    [20, 20, 20]
+    >>> all(50 <= size <= 500 for size in request_sizes((50, 500), 1000))
+    True
+    >>> max(request_sizes((1, 10**10), 1000)) > 1 << 32
+    True
+    >>> request_sizes((50, 500), -2)
+    []
+    >>> request_sizes((500, 50), 3)
+    Traceback (most recent call last):
+    ...
+    ValueError: Byte range (500,50) ends below where it starts.
+    """
+    lower_bound, upper_bound = byte_tuple
+    num_requests = max(num_requests, 0)
+    if lower_bound and upper_bound:
+        span = upper_bound - lower_bound + 1
+        if span <= 0:
+            raise ValueError(f'Byte range ({lower_bound},{upper_bound}) ends below where it starts.')
+        if span > 1 << 16:
+            return [random.randint(lower_bound, upper_bound) for _ in range(num_requests)]
+        draws = array.array('I')
+        draws.frombytes(random.randbytes(draws.itemsize * num_requests))
+        return [lower_bound + draw % span for draw in draws]
+    return itertools.repeat(lower_bound, num_requests)
+
+
+def generate_allocs(arg_string, live_flags, alloc_ids, out):
+    """
+    Given an argument string from the command line, the live flags of the ids to manage, the last alloc id, and a list
+    of pending script lines, append the appropriate alloc calls, manage the flags, and return the new alloc_id. We allow
+    the user to define one sized set of allocations, a size range, or no sizes, in which case we will choose random
+    sizes for them.
+    >>> out = []
+    >>> live_flags = bytearray()
+    >>> generate_allocs('alloc(20) 3', live_flags, 0, out)
     3
+    >>> out
+    ['a 0 20', 'a 1 20', 'a 2 20']
+    >>> list(live_flags)
+    [1, 1, 1]
     """
-    byte_tuple = identify_byte_range(arg_string[1:])
-    num_requests = identify_num_requests(arg_string[1:])
-    for i in range(num_requests):
-        if byte_tuple[0] and byte_tuple[1]:
-            id_byte_map[alloc_ids] = random.randint(byte_tuple[0], byte_tuple[1])
-            print(f'{Print_Call.alloc} {alloc_ids} {id_byte_map[alloc_ids]}')
-        else:
-            id_byte_map[alloc_ids] = byte_tuple[0]
-            print(f'{Print_Call.alloc} {alloc_ids} {id_byte_map[alloc_ids]}')
-        alloc_ids += 1
-    return alloc_ids
-
-
-def generate_reallocs(arg_string, id_byte_map, realloc_ids):
+    _, byte_tuple, num_requests = identify_request(arg_string)
+    new_ids = range(alloc_ids, alloc_ids + max(num_requests, 0))
+    # Alloc ids are handed out in order so the new ids are always the next flags.
+    live_flags.extend(bytes([1]) * len(new_ids))
+    lower_bound, upper_bound = byte_tuple
+    if lower_bound and upper_bound:
+        sizes = request_sizes(byte_tuple, len(new_ids))
+        out.extend([f'{ALLOC_PREFIX}{i} {size}' for i, size in zip(new_ids, sizes)])
+    else:
+        # Every request has the same size so format it once for the whole run.
+        suffix = f' {lower_bound}'
+        out.extend([f'{ALLOC_PREFIX}{i}{suffix}' for i in new_ids])
+    return new_ids.stop
+
+
+def generate_reallocs(arg_string, live_flags, realloc_ids, out):
     """
-    Given an argument string from the command line, a dict of ids to manage, the last realloc id, print the appropriate
-    realloc calls, manage the dict, and return the new realloc_id. We allow the user to define one sized set of
-    reallocations, a size range, or no sizes, in which case we will choose random sizes for them.
-    >>> generate_reallocs('realloc(20) 3', {0:1,1:5,2:10}, 0)
-    r 0 20
-    r 1 20
-    r 2 20
+    Given an argument string from the command line, the live flags of the ids to manage, the last realloc id, and a
+    list of pending script lines, append the appropriate realloc calls, and return the new realloc_id. We allow the
+    user to define one sized set of reallocations, a size range, or no sizes, in which case we will choose random sizes
+    for them.
+    >>> out = []
+    >>> generate_reallocs('realloc(20) 3', bytearray([1, 1, 1]), 0, out)
     0
+    >>> out
+    ['r 0 20', 'r 1 20', 'r 2 20']
+    >>> out = []
+    >>> generate_reallocs('realloc(20) 3', bytearray([0, 1, 0, 1, 0, 1, 0, 1]), 4, out)
+    3
+    >>> out
+    ['r 5 20', 'r 7 20', 'r 1 20']
     """
-    byte_tuple = identify_byte_range(arg_string[1:])
-    num_requests = identify_num_requests(arg_string[1:])
+    _, byte_tuple, num_requests = identify_request(arg_string)
+    # Frees leave gaps in the ids so index the surviving ids directly rather than probing the flags for each one.
+    live_ids = list(itertools.compress(range(len(live_flags)), live_flags))
     if num_requests == ALL_IDS:
-        num_requests = len(id_byte_map)
-    for i in range(num_requests):
-
-        # We also need to skip over gaps that may have formed in the map from frees.
-        while realloc_ids not in id_byte_map:
-            realloc_ids = (realloc_ids + 1) % len(id_byte_map)
-
-        if byte_tuple[0] and byte_tuple[1]:
-            print(f'{Print_Call.realloc} {realloc_ids} {random.randint(byte_tuple[0], byte_tuple[1])}')
-        else:
-            print(f'{Print_Call.realloc} {realloc_ids} {byte_tuple[0]}')
-
-        # If we just want to have a certain number of reallocs as a test they will just wrap.
-        realloc_ids = (realloc_ids + 1) % len(id_byte_map)
-    return realloc_ids
-
-
-def generate_file_heap_use(arg_array):
+        num_requests = len(live_ids)
+    if not live_ids:
+        return realloc_ids
+    start = bisect.bisect_left(live_ids, realloc_ids)
+    num_requests = max(num_requests, 0)
+    # Start at the first live id past the last realloc. If we just want to have a certain number of reallocs as a test
+    # they will just wrap.
+    targets = itertools.islice(itertools.cycle(live_ids[start:] + live_ids[:start]), num_requests)
+    lower_bound, upper_bound = byte_tuple
+    if lower_bound and upper_bound:
+        out.extend([f'{REALLOC_PREFIX}{i} {size}' for i, size in zip(targets, request_sizes(byte_tuple, num_requests))])
+    else:
+        # Every request has the same size so format it once for the whole run.
+        suffix = f' {lower_bound}'
+        out.extend([f'{REALLOC_PREFIX}{i}{suffix}' for i in targets])
+    return live_ids[(start + num_requests) % len(live_ids)]
+
+
+def generate_file_heap_use(arg_array, script_file, validator):
     """
-    Given an array of heap requests to process of the pattern '-request number_of_requests'
-    generate a script that follows the requested pattern. By default requests to free
+    Given an array of heap requests to process of the pattern '-request number_of_requests', an open .script file, and
+    a Script_Validator, generate a script that follows the requested pattern. By default requests to free
     memory will free every other memory address, otherwise coalescing would create one large
     free block.
     """
-    id_byte_map = {}
+    # One byte per id ever allocated that stays set while the id is live. Sizes are never read back after the line
+    # is written so they are not kept.
+    live_flags = bytearray()
     alloc_ids = 0
     free_ids = 0
     realloc_ids = 0
+    # Every request appends its lines here and the whole script goes out in one write at the end.
+    out = []
     for idx, arg in enumerate(arg_array):
         arg_string = ' '.join(arg_array[idx:])
         if arg_string[0] == '-':
             # Identify the argument
-            arg_call = identify_call(arg_string[1:])
+            arg_call = identify_call(arg_string)
             if arg_call == Print_Call.free:
-                free_ids = generate_frees(arg_string, id_byte_map, free_ids)
+                free_ids = generate_frees(arg_string, live_flags, free_ids, out)
             elif arg_call == Print_Call.alloc:
-                alloc_ids = generate_allocs(arg_string, id_byte_map, alloc_ids)
+                alloc_ids = generate_allocs(arg_string, live_flags, alloc_ids, out)
             elif arg_call == Print_Call.realloc:
-                realloc_ids = generate_reallocs(arg_string, id_byte_map, realloc_ids)
+                realloc_ids = generate_reallocs(arg_string, live_flags, realloc_ids, out)
             # Heap calls will be left as is and we will not automatically free all allocated memory.
             elif arg_call == Print_Call.leak:
+                write_script_lines(out, script_file, validator)
                 return
 
     # We will have a thorough cleanup in order to avoid possible leaks in user's heap allocator.
-    for idx, item in enumerate(id_byte_map):
-        if idx == len(id_byte_map) - 1:
-            print(f'{Print_Call.free} {item}', end='')
-        else:
-            print(f'{Print_Call.free} {item}')
-
-
-def validate_script(file):
-    """
-    Given a generated script file, verifies that the calls to the heap are logical. We are mainly concerned with frees
-    and reallocations because we need to have existing allocations in place to complete those two operations.
-    """
-    # Track the most recent request for each memory id number. Make sure they are logical.
-    memory_request_dict = {}
-    with open(file, 'r', encoding='utf-8') as f:
-        for idx, line in enumerate(f):
-            line_lst = line.split()
-            request_type = line_lst[0]
-            memory_id = line_lst[1]
-            if memory_id not in memory_request_dict:
-                if request_type == 'r':
-                    raise ValueError(f'line {idx + 1}. Did not properly add alloc before incoming realloc.')
-                elif request_type == 'f':
-                    raise ValueError(f'line {idx + 1}. Free request for memory id not in the script.')
-                memory_request_dict[memory_id] = request_type
-            else:
-                # Keeping the last request should be helpful because we can spot use after free.
-                if request_type == 'a' and memory_request_dict[memory_id] == 'a':
-                    raise ValueError(f'line {idx + 1}. Two allocations with same memory id should not be possible.')
-                elif request_type == 'f':
-                    memory_request_dict.pop(memory_id)
+    out.extend([f'{FREE_PREFIX}{item}' for item in itertools.compress(range(len(live_flags)), live_flags)])
+    write_script_lines(out, script_file, validator)
+
+
+class Script_Validator():
+    """
+    Given the lines of a script as they are produced, verifies that the calls to the heap are logical. We are mainly
+    concerned with frees and reallocations because we need to have existing allocations in place to complete those two
+    operations. Feeding lines as they are written saves reading the whole script back from disk afterwards.
+    >>> validator = Script_Validator()
+    >>> validator.feed_lines(['a 0 8', 'r 0 16', 'a 1 8', 'f 0'])
+    >>> validator.feed(Print_Call.realloc, '1')
+    >>> validator.feed(Print_Call.free, '0')
+    Traceback (most recent call last):
+    ...
+    ValueError: line 6. Free request for memory id not in the script.
+    """
+
+    def __init__(self):
+        # Track the most recent request for each memory id number. Make sure they are logical.
+        self.memory_request_dict = {}
+        self.line_count = 0
+
+    def feed(self, request_type, memory_id):
+        """
+        Given the request type and memory id of the next script line, raise a ValueError if the request is not
+        possible after every line fed before it.
+        """
+        self.feed_requests(((request_type, memory_id),))
+
+    def feed_lines(self, lines):
+        """
+        Given an iterable of script lines, feed the request type and memory id of each one in order.
+        """
+        self.feed_requests(map(str.split, lines))
+
+    def feed_binary_lines(self, lines):
+        """
+        Given an iterable of script lines read from a file opened in binary mode, feed the request type and memory id of
+        each one in order without decoding them.
+        >>> validator = Script_Validator()
+        >>> validator.feed_binary_lines([b'a 0 8', b'r 0 16', b'f 0'])
+        >>> validator.feed_binary_lines([b'f 0'])
+        Traceback (most recent call last):
+        ...
+        ValueError: line 4. Free request for memory id not in the script.
+        """
+        self.feed_requests(map(bytes.split, lines), BINARY_SCRIPT_CALLS)
+
+    def feed_requests(self, requests, script_calls=SCRIPT_CALLS):
+        """
+        Given an iterable of sequences that start with a request type and memory id, and the alloc, realloc, and free
+        request types they use, feed each one in order. Scripts run to millions of lines so the whole batch is checked
+        in one loop rather than a method call per line.
+        """
+        memory_request_dict = self.memory_request_dict
+        line_count = self.line_count
+        alloc, realloc, free = script_calls
+        try:
+            for request in requests:
+                line_count += 1
+                request_type, memory_id = request[0], request[1]
+                if memory_id not in memory_request_dict:
+                    if request_type == realloc:
+                        raise ValueError(f'line {line_count}. Did not properly add alloc before incoming realloc.')
+                    elif request_type == free:
+                        raise ValueError(f'line {line_count}. Free request for memory id not in the script.')
+                    memory_request_dict[memory_id] = request_type
+                else:
+                    # Keeping the last request should be helpful because we can spot use after free.
+                    if request_type == alloc and memory_request_dict[memory_id] == alloc:
+                        raise ValueError(
+                            f'line {line_count}. Two allocations with same memory id should not be possible.')
+                    elif request_type == free:
+                        memory_request_dict.pop(memory_id)
+        finally:
+            self.line_count = line_count
+
+
+def validate_script(script):
+    """
+    Given a generated script file, or an iterable of (request type, memory id) records already in memory, verifies that
+    the calls to the heap are logical. Scripts produced by this program are already validated as they are written so
+    a file is only read back to check it on its own.
+    >>> validate_script([('a', '0'), ('r', '0'), ('f', '0')])
+    >>> validate_script([('a', '0'), ('f', '1')])
+    Traceback (most recent call last):
+    ...
+    ValueError: line 2. Free request for memory id not in the script.
+    """
+    if not isinstance(script, (str, bytes, os.PathLike)):
+        Script_Validator().feed_requests(script)
+        return
+    with open(script, 'rb', buffering=1 << 20) as f:
+        Script_Validator().feed_binary_lines(f)
 
 
 def main():
@@ -527,13 +675,9 @@ def main():
 
     # -parse trace_input parsed_file_output
     if len(args) == 3 and args[0] == '-parse':
-        original_stdout = sys.stdout
-        with open(args[2], 'w', encoding='utf-8') as f:
-            sys.stdout = f
-            parse_file_heap_use(args[1])
-            sys.stdout = original_stdout
-            validate_script(args[2])
-            print('Ltrace successfully parsed!')
+        with open(args[2], 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as f:
+            parse_file_heap_use(args[1], f, Script_Validator())
+        print('Ltrace successfully parsed!')
 
     # Requests to generate custom scripts must always begin with alloc.
     # Unspecified range of request size will be random.
@@ -554,14 +698,16 @@ def main():
     # Finally, if you do not want to automatically free all memory at end of script use -leak flag.
     # -generate filename '-alloc(single_byte_size)' 10000 '-free(800,1200) 5000' -leak
     if len(args) >= 4 and args[0] == '-generate':
-        original_stdout = sys.stdout
-        with open(args[1], 'w', encoding='utf-8') as f:
-            print('Generating script...')
-            sys.stdout = f
-            generate_file_heap_use(args[2:])
-            sys.stdout = original_stdout
-            validate_script(args[1])
-            print('Script successfully generated!')
+        print('Generating script...')
+        with open(args[1], 'w', encoding='utf-8', newline='\n', buffering=1 << 20) as f:
+            generate_file_heap_use(args[2:], f, Script_Validator())
+        print('Script successfully generated!')
+
+    # Scripts are validated as they are written but one may still be checked on its own.
+    # -validate script_file
+    if len(args) == 2 and args[0] == '-validate':
+        validate_script(args[1])
+        print('Script is valid!')
 
 
 if __name__ == '__main__':